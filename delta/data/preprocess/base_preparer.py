@@ -16,18 +16,22 @@
 '''Base class for Preparer'''
 
 import os
-import math
+import collections
+import tempfile
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from absl import logging
 import tensorflow as tf
+from tensorflow.core.protobuf.rewriter_config_pb2 import RewriterConfig
 import numpy as np
 
 from delta import utils
 from delta.data.preprocess.utils import prepare_embedding
+from delta.data.preprocess.utils import count_tokens
 from delta.utils.solver.utils.solver_utils import get_session_conf
 from delta.data.preprocess.utils import prepare_vocab
 from delta.data.preprocess.utils import prepare_vocab_from_config
-from delta.data.preprocess.utils import get_pre_process_text_ds_iter
+from delta.data.preprocess.utils import get_pre_process_text_tensor
 
 
 class Preparer:
@@ -46,10 +50,9 @@ class Preparer:
 
   def done_prepare(self):
     """Touch a sign file after the prepare process is done."""
-    if self.done_sign != "" and not os.path.exists(self.done_sign):
-      if not os.path.exists(os.path.dirname(self.done_sign)):
-        os.makedirs(os.path.dirname(self.done_sign))
-      Path(self.done_sign).touch()
+    if self.done_sign != "":
+      os.makedirs(os.path.dirname(self.done_sign), exist_ok=True)
+      Path(self.done_sign).touch(exist_ok=True)
 
   def do_prepare(self, pre_process_pipeline):
     """Do the prepare processing."""
@@ -66,8 +69,12 @@ class TextPreparer(Preparer):
         'infer_no_label', False)
     self.model_config = self.config["model"]
     self.task_config = self.config["data"]["task"]
-    self.batch_size = self.task_config['batch_size']
-    self.num_parallel_calls = self.task_config['num_parallel_calls']
+    self.num_parallel_calls = self.task_config.get('num_parallel_calls')
+    if self.num_parallel_calls is None:
+      self.num_parallel_calls = tf.data.experimental.AUTOTUNE
+    self.num_prepare_workers = self.task_config.get('num_prepare_workers', 1)
+    self.prepare_tmp_dir = self.config["data"]["task"]["preparer"].get(
+        "tmp_dir", None)
     self.vocab_min_frequency = self.task_config['vocab_min_frequency']
     self.use_custom_vocab = self.task_config.get('use_custom_vocab', False)
     self.text_vocab_file_path = self.task_config['text_vocab']
@@ -78,20 +85,26 @@ class TextPreparer(Preparer):
     self.multi_output = bool(self.output_num > 1)
     self.multi_text = False
     self.session_conf = get_session_conf(self.config)
-    self.init_feed_dict = {}
+    # The pre-process graph is feed-forward string ops only.
+    rewrite_options = self.session_conf.graph_options.rewrite_options
+    rewrite_options.arithmetic_optimization = RewriterConfig.AGGRESSIVE
+    rewrite_options.function_optimization = RewriterConfig.ON
+    rewrite_options.loop_optimization = RewriterConfig.ON
+    self.text_path_placeholder = None
+    self.text_num_placeholder = None
+    self.text_t = None
+    self.sess = None
 
   def prepare_raw_data(self, pre_process_pipeline):
     """
     Preparing raw data.
-    For all kinds of text input, all_texts: [sentence1, ...]
+    For all kinds of text input, text_counter: Counter({token1: count1, ...})
     For single output, all_labels: [[label1, label2, ...]]
     For multiple outputs, all_labels: [[label1_1, ...], [label1_2, ...]]
     """
-    if self.output_num <= 1:
-      all_labels = []
-    else:
-      all_labels = [[] for _ in range(self.output_num)]
-    all_texts = []
+    all_labels = [[] for _ in range(max(self.output_num, 1))]
+    text_counter = collections.Counter()
+    raw_files = []
     for mode in self.all_modes:
       paths = self.config["data"][mode]['paths']
       paths_after_pre_process = [one_path + ".after" for one_path in paths]
@@ -101,65 +114,115 @@ class TextPreparer(Preparer):
       infer_without_label = bool(mode == utils.INFER and self.infer_no_label)
 
       for one_path, one_path_after in zip(paths, paths_after_pre_process):
-        self.prepare_one_raw_data(one_path, one_path_after, mode,
-                                  infer_without_label, pre_process_pipeline,
-                                  all_texts, all_labels)
-    if self.output_num <= 1:
-      all_labels = [all_labels]
-    return all_texts, all_labels
+        raw_files.append((one_path, one_path_after, mode, infer_without_label))
+    self.prepare_raw_files(raw_files, pre_process_pipeline, text_counter,
+                           all_labels)
+    return text_counter, all_labels
+
+  def init_text_pipeline(self, pre_process_pipeline):
+    """Build the text pre-process pipeline once for all raw files."""
+    self.text_path_placeholder = tf.placeholder(
+        dtype=tf.string, shape=(), name="text_path")
+    self.text_num_placeholder = tf.placeholder(
+        dtype=tf.int64, shape=(), name="text_num")
+    text_ds = tf.data.TFRecordDataset(self.text_path_placeholder)
+    self.text_t = get_pre_process_text_tensor(text_ds,
+                                              self.text_num_placeholder,
+                                              pre_process_pipeline,
+                                              self.num_parallel_calls)
+
+  def prepare_raw_files(self, raw_files, pre_process_pipeline, text_counter,
+                        all_labels):
+    """
+    Prepare raw files concurrently in one session.
+    raw_files: [(one_path, one_path_after, mode, infer_without_label), ...]
+    Results are merged in the order of raw_files. At most num_prepare_workers
+    files are in flight, each one held in memory as a whole.
+    """
+    self.init_text_pipeline(pre_process_pipeline)
+    max_workers = max(min(len(raw_files), self.num_prepare_workers), 1)
+    with tf.Session(config=self.session_conf) as self.sess, \
+        ThreadPoolExecutor(max_workers=max_workers) as executor:
+      futures = collections.deque()
+      for raw_file in raw_files:
+        if len(futures) >= max_workers:
+          self.merge_raw_data(futures.popleft().result(), text_counter,
+                              all_labels)
+        futures.append(executor.submit(self.prepare_one_raw_data, *raw_file))
+      while futures:
+        self.merge_raw_data(futures.popleft().result(), text_counter,
+                            all_labels)
+
+  def merge_raw_data(self, result, text_counter, all_labels):
+    """Merge the result of prepare_one_raw_data."""
+    texts_after, labels = result
+    for text_after in texts_after:
+      text_counter.update(count_tokens(text_after))
+    for one_all_labels, one_labels in zip(all_labels, labels):
+      one_all_labels.extend(one_labels)
 
   def prepare_one_raw_data(self, one_path, one_path_after, mode,
-                           infer_without_label, pre_process_pipeline, all_texts,
-                           all_labels):
-    """Prepare one raw data."""
+                           infer_without_label):
+    """
+    Prepare one raw data.
+    Return all texts after pre-process and labels.
+    texts_after: [[sentence1, ...]] or [[sentence1_1, ...], [sentence1_2, ...]]
+    labels: [[label1, ...]] or [[label1_1, ...], [label1_2, ...]]
+    """
     text, label = self.load_a_raw_file(one_path, mode, infer_without_label)
+    tmp_dir = self.get_tmp_dir(one_path_after)
 
     if self.multi_text:
       one_text_after = []
-      for i, one_text in enumerate(text):
-        text_placeholder = tf.placeholder(
-            dtype=tf.string, shape=(None,), name="text_{}".format(i))
-        self.init_feed_dict[text_placeholder] = one_text
-        one_text_iterator = get_pre_process_text_ds_iter(
-            text_placeholder, pre_process_pipeline, self.num_parallel_calls,
-            self.batch_size)
-        batch_num = int(math.ceil(len(one_text) / float(self.batch_size)))
-        text_after_arr = self.run_text_pipeline(one_text_iterator, batch_num)
+      for one_text in text:
+        text_after_arr = self.run_text_pipeline(one_text, tmp_dir)
         text_after = [one_line.decode("utf-8") for one_line in text_after_arr]
-        all_texts += text_after
         one_text_after.append(text_after)
+      texts_after = one_text_after
     else:
-      text_placeholder = tf.placeholder(
-          dtype=tf.string, shape=(None,), name="text")
-      self.init_feed_dict[text_placeholder] = text
-      text_iterator = get_pre_process_text_ds_iter(text_placeholder,
-                                                   pre_process_pipeline,
-                                                   self.num_parallel_calls,
-                                                   self.batch_size)
-      batch_num = int(math.ceil(len(text) / float(self.batch_size)))
-      text_after_arr = self.run_text_pipeline(text_iterator, batch_num)
+      text_after_arr = self.run_text_pipeline(text, tmp_dir)
       text_after = [one_line.decode("utf-8") for one_line in text_after_arr]
-      all_texts += text_after
       one_text_after = text_after
+      texts_after = [text_after]
 
-    if self.multi_output:
-      for i in range(self.output_num):
-        all_labels[i] += label[i]
-    else:
-      all_labels += label
     logging.debug(f"one_text_after: {len(one_text_after)}")
     self.save_a_raw_file(label, one_text_after, one_path_after,
                          infer_without_label)
+    labels = label if self.multi_output else [label]
+    return texts_after, labels
 
-  def run_text_pipeline(self, text_iterator, batch_num):
+  def get_tmp_dir(self, one_path_after):
+    """
+    Directory to stage temporary files for one raw file.
+    Default to the directory of the output file, which is known to be
+    writable and to have room for data of this size.
+    """
+    if self.prepare_tmp_dir:
+      return self.prepare_tmp_dir
+    return os.path.dirname(os.path.abspath(one_path_after))
+
+  def run_text_pipeline(self, text, tmp_dir):
     """Run the text pre-process pipeline, fetch data in numpy array format."""
-    text_after = []
-    text_t = text_iterator.get_next()
-    with tf.Session(config=self.session_conf) as sess:
-      sess.run(text_iterator.initializer, feed_dict=self.init_feed_dict)
-      for _ in range(batch_num):
-        text_after.append(sess.run(text_t))
-    text_after_arr = np.concatenate(text_after, axis=0)
+    if not text:
+      # The single batch of an empty dataset does not exist.
+      return np.array([], dtype=object)
+    # Stage the text to a temporary file and stream it into the pipeline,
+    # instead of feeding the whole text as one tensor.
+    os.makedirs(tmp_dir, exist_ok=True)
+    fd, text_path = tempfile.mkstemp(suffix=".tfrecord", dir=tmp_dir)
+    os.close(fd)
+    try:
+      with tf.io.TFRecordWriter(text_path) as writer:
+        for one_line in text:
+          writer.write(tf.compat.as_bytes(one_line))
+      text_after_arr = self.sess.run(
+          self.text_t,
+          feed_dict={
+              self.text_path_placeholder: text_path,
+              self.text_num_placeholder: len(text)
+          })
+    finally:
+      os.remove(text_path)
     return text_after_arr
 
   def load_a_raw_file(self, one_path, mode, infer_without_label):
@@ -169,23 +232,35 @@ class TextPreparer(Preparer):
     For multiple text inputs, text: [[sentence1_1, ...], [sentence1_2, ...]]
     For single output, label: [label1, label2, ...]
     For multiple outputs, label: [[label1_1, ...], [label1_2, ...]]
+    It is called concurrently for different files from worker threads,
+    so it must be thread-safe.
     """
     raise NotImplementedError
 
   def save_a_raw_file(self, label, text_after, one_path_after,
                       infer_without_label):
-    """Save a raw file."""
+    """
+    Save a raw file.
+    It is called concurrently for different files from worker threads,
+    so it must be thread-safe.
+    """
     raise NotImplementedError
 
   def prepare_embed(self):
     """Preparing embedding."""
     logging.info("Preparing embedding ...")
     if self.model_config["use_pre_train_emb"]:
+      embedding_path = self.model_config["embedding_path"]
+      if self.reuse and os.path.exists(embedding_path) and \
+        os.path.getmtime(embedding_path) >= max(
+            os.path.getmtime(self.model_config["pre_train_emb_path"]),
+            os.path.getmtime(self.text_vocab_file_path)):
+        logging.info("Reuse embedding file: {}".format(embedding_path))
+        return
       prepare_embedding(self.model_config["pre_train_emb_path"],
-                        self.task_config["text_vocab"],
-                        self.model_config["embedding_path"])
+                        self.text_vocab_file_path, embedding_path)
 
-  def prepare_text_vocab(self, all_texts):
+  def prepare_text_vocab(self, text_counter):
     """Preparing text vocab"""
     if os.path.exists(self.text_vocab_file_path) and \
       self.use_custom_vocab:
@@ -194,7 +269,7 @@ class TextPreparer(Preparer):
     else:
       prepare_vocab(
           self.text_vocab_file_path,
-          all_texts,
+          text_counter,
           min_frequency=self.vocab_min_frequency)
       logging.info("Generate text vocab file: {}".format(
           self.text_vocab_file_path))
@@ -222,15 +297,15 @@ class TextPreparer(Preparer):
         logging.info("Generate label vocab file: {}".format(
             self.label_vocab_file_paths[i]))
 
-  def prepare_vocabs(self, all_texts, all_labels):
+  def prepare_vocabs(self, text_counter, all_labels):
     """Preparing vocab for x."""
     logging.info("Preparing vocab for x ...")
-    self.prepare_text_vocab(all_texts)
+    self.prepare_text_vocab(text_counter)
     logging.info("Preparing vocab for y ...")
     self.prepare_label_vocab(all_labels)
 
   def do_prepare(self, pre_process_pipeline):
     """Do the prepare processing."""
-    all_texts, all_labels = self.prepare_raw_data(pre_process_pipeline)
-    self.prepare_vocabs(all_texts, all_labels)
+    text_counter, all_labels = self.prepare_raw_data(pre_process_pipeline)
+    self.prepare_vocabs(text_counter, all_labels)
     self.prepare_embed()
@@ -0,0 +1,201 @@
+# Copyright (C) 2017 Beijing Didi Infinity Technology and Development Co.,Ltd.
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+''' base preparer unittest'''
+
+# pylint: disable=missing-docstring
+
+import os
+import time
+import tempfile
+from pathlib import Path
+import tensorflow as tf
+from absl import logging
+
+from delta import utils
+from delta.data.preprocess.base_preparer import TextPreparer
+from delta.data.preprocess.text_cls_preparer import TextClsPreparer
+
+
+class TextPreparerTest(tf.test.TestCase):
+
+  def setUp(self):
+    ''' set up '''
+    main_root = Path(os.environ['MAIN_ROOT'])
+    config_file = main_root.joinpath(
+        'egs/mock_text_cls_data/text_cls/v1/config/han-cls.yml')
+    self.config = utils.load_config(config_file)
+    self.tmp_dir = tempfile.mkdtemp()
+    tmp_dir = self.tmp_dir
+    self.pre_train_emb_path = os.path.join(tmp_dir, "pre_train_emb.txt")
+    self.text_vocab_path = os.path.join(tmp_dir, "text_vocab.txt")
+    self.embedding_path = os.path.join(tmp_dir, "embedding.pkl")
+    with open(self.pre_train_emb_path, "w", encoding="utf-8") as out_f:
+      out_f.write("2 3\n")
+      out_f.write("hello 1.0 2.0 3.0\n")
+      out_f.write("world 3.0 2.0 1.0\n")
+    with open(self.text_vocab_path, "w", encoding="utf-8") as out_f:
+      out_f.write("hello\t0\n")
+      out_f.write("delta\t1\n")
+
+    model_config = self.config["model"]
+    model_config["use_pre_train_emb"] = True
+    model_config["pre_train_emb_path"] = self.pre_train_emb_path
+    model_config["embedding_path"] = self.embedding_path
+    self.config["data"]["task"]["text_vocab"] = self.text_vocab_path
+
+  def write_raw_files(self, mode, lines_list):
+    paths = []
+    for i, lines in enumerate(lines_list):
+      path = os.path.join(self.tmp_dir, "{}_{}.txt".format(mode, i))
+      with open(path, "w", encoding="utf-8") as out_f:
+        out_f.write("".join(one_line + "\n" for one_line in lines))
+      paths.append(path)
+    self.config["data"][mode]["paths"] = paths
+    return paths
+
+  def read_file(self, path):
+    with open(path, encoding="utf-8") as in_f:
+      return in_f.read()
+
+  def tearDown(self):
+    ''' tear down '''
+
+  def prepare_embed(self, reuse):
+    self.config["data"]["task"]["preparer"]["reuse"] = reuse
+    preparer = TextPreparer(self.config)
+    preparer.prepare_embed()
+
+  def set_mtime(self, path, mtime):
+    os.utime(path, (mtime, mtime))
+
+  def test_prepare_embed(self):
+    self.prepare_embed(reuse=True)
+    self.assertTrue(os.path.exists(self.embedding_path))
+
+    now = int(time.time())
+    self.set_mtime(self.pre_train_emb_path, now - 20)
+    self.set_mtime(self.text_vocab_path, now - 20)
+    self.set_mtime(self.embedding_path, now - 10)
+
+    # Up to date embedding is reused.
+    self.prepare_embed(reuse=True)
+    self.assertEqual(os.path.getmtime(self.embedding_path), now - 10)
+
+    # A newer text vocab forces regeneration.
+    self.set_mtime(self.text_vocab_path, now - 5)
+    self.prepare_embed(reuse=True)
+    self.assertGreater(os.path.getmtime(self.embedding_path), now - 5)
+
+    # Without reuse, the embedding is always regenerated.
+    self.set_mtime(self.embedding_path, now - 1)
+    self.prepare_embed(reuse=False)
+    self.assertGreater(os.path.getmtime(self.embedding_path), now - 1)
+
+  def test_reuse_embed_after_prepare_vocabs(self):
+    task_config = self.config["data"]["task"]
+    task_config["use_custom_vocab"] = False
+    task_config["vocab_min_frequency"] = 1
+    task_config["label_vocab"] = os.path.join(self.tmp_dir, "label_vocab.txt")
+    task_config["preparer"]["reuse"] = True
+    self.write_raw_files(utils.INFER, [["0\thello world"]])
+    self.write_raw_files(utils.EVAL, [["1\thello delta"]])
+    train_paths = self.write_raw_files(utils.TRAIN, [["0\tworld delta"]])
+
+    preparer = TextClsPreparer(self.config)
+    preparer.do_prepare(lambda text: text)
+    self.assertTrue(os.path.exists(self.embedding_path))
+
+    now = int(time.time())
+    self.set_mtime(self.pre_train_emb_path, now - 20)
+    self.set_mtime(self.text_vocab_path, now - 20)
+    self.set_mtime(self.embedding_path, now - 10)
+
+    # Same raw data: the vocab is not rewritten and the embedding is reused.
+    preparer = TextClsPreparer(self.config)
+    preparer.do_prepare(lambda text: text)
+    self.assertEqual(os.path.getmtime(self.text_vocab_path), now - 20)
+    self.assertEqual(os.path.getmtime(self.embedding_path), now - 10)
+
+    # A new word changes the vocab, so the embedding is regenerated.
+    with open(train_paths[0], "a", encoding="utf-8") as out_f:
+      out_f.write("1\tnew words\n")
+    preparer = TextClsPreparer(self.config)
+    preparer.do_prepare(lambda text: text)
+    self.assertGreater(os.path.getmtime(self.text_vocab_path), now - 20)
+    self.assertGreater(os.path.getmtime(self.embedding_path), now - 10)
+
+  def test_prepare_raw_data_deterministic(self):
+    self.write_raw_files(utils.INFER, [["0\tinfer a"]])
+    self.write_raw_files(utils.EVAL, [["1\teval b"], ["0\teval c"]])
+    train_paths = self.write_raw_files(
+        utils.TRAIN, [["1\ttrain d e", "0\ttrain f"], ["0\ttrain g"],
+                      ["1\ttrain h"], ["0\ttrain i j"]])
+
+    results = []
+    for num_prepare_workers in (1, 3):
+      self.config["data"]["task"]["num_prepare_workers"] = num_prepare_workers
+      preparer = TextClsPreparer(self.config)
+      text_counter, all_labels = preparer.prepare_raw_data(lambda text: text)
+      after_files = [
+          self.read_file(one_path + ".after") for one_path in train_paths
+      ]
+      results.append((list(text_counter.items()), all_labels, after_files))
+
+    self.assertEqual(results[0], results[1])
+    text_counter_items, all_labels, after_files = results[0]
+    self.assertEqual([word for word, _ in text_counter_items], [
+        "infer", "a", "eval", "b", "c", "train", "d", "e", "f", "g", "h", "i",
+        "j"
+    ])
+    self.assertEqual(all_labels, [["0", "1", "0", "1", "0", "0", "1", "0"]])
+    self.assertEqual(after_files, [
+        "1\ttrain d e\n0\ttrain f\n", "0\ttrain g\n", "1\ttrain h\n",
+        "0\ttrain i j\n"
+    ])
+
+  def test_prepare_empty_raw_file(self):
+    self.write_raw_files(utils.INFER, [["0\tinfer a"]])
+    self.write_raw_files(utils.EVAL, [[]])
+    train_paths = self.write_raw_files(utils.TRAIN, [[], ["1\ttrain b"]])
+
+    preparer = TextClsPreparer(self.config)
+    text_counter, all_labels = preparer.prepare_raw_data(lambda text: text)
+    self.assertEqual(list(text_counter), ["infer", "a", "train", "b"])
+    self.assertEqual(all_labels, [["0", "1"]])
+    self.assertEqual(self.read_file(train_paths[0] + ".after"), "")
+    self.assertEqual(self.read_file(train_paths[1] + ".after"), "1\ttrain b\n")
+
+  def test_tmp_dir(self):
+    one_path_after = os.path.join(self.tmp_dir, "train.txt.after")
+    preparer = TextClsPreparer(self.config)
+    self.assertEqual(preparer.get_tmp_dir(one_path_after), self.tmp_dir)
+
+    stage_dir = os.path.join(self.tmp_dir, "stage")
+    self.config["data"]["task"]["preparer"]["tmp_dir"] = stage_dir
+    preparer = TextClsPreparer(self.config)
+    self.assertEqual(preparer.get_tmp_dir(one_path_after), stage_dir)
+
+    self.write_raw_files(utils.INFER, [["0\tinfer a"]])
+    self.write_raw_files(utils.EVAL, [["1\teval b"]])
+    self.write_raw_files(utils.TRAIN, [["0\ttrain c"]])
+    preparer.prepare_raw_data(lambda text: text)
+    # Staged files are removed once the pipeline has consumed them.
+    self.assertEqual(os.listdir(stage_dir), [])
+
+
+if __name__ == '__main__':
+  logging.set_verbosity(logging.DEBUG)
+  tf.test.main()
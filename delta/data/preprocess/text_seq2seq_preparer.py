@@ -16,6 +16,7 @@
 ''' Preparer for text sequence to sequence.'''
 
 import os
+import collections
 from delta import utils
 from absl import logging
 from delta.data.preprocess.base_preparer import TextPreparer
@@ -38,15 +39,13 @@ class TextS2SPreparer(TextPreparer):
   def prepare_raw_data(self, pre_process_pipeline):
     """
     Preparing raw data.
-    For all kinds of text input, all_texts: [sentence1, ...]
-    For single output, all_labels: [label1, label2, ...]
+    For all kinds of text input, text_counter: Counter({token1: count1, ...})
+    For single output, all_labels: [[label1, label2, ...]]
     For multiple outputs, all_labels: [[label1_1, ...], [label1_2, ...]]
     """
-    if self.output_num <= 1:
-      all_labels = []
-    else:
-      all_labels = [[] for _ in range(self.output_num)]
-    all_texts = []
+    all_labels = [[] for _ in range(max(self.output_num, 1))]
+    text_counter = collections.Counter()
+    raw_files = []
     for mode in self.all_modes:
       paths = self.config["data"][mode]['paths']
       paths = [paths['source'], paths['target']]
@@ -60,11 +59,12 @@ class TextS2SPreparer(TextPreparer):
 
       for one_path_text, one_path_target, \
           one_path_text_after, one_path_target_after in zip(*paths, *paths_after_pre_process):
-        self.prepare_one_raw_data((one_path_text, one_path_target),
-                                  (one_path_text_after, one_path_target_after),
-                                  mode, infer_without_label,
-                                  pre_process_pipeline, all_texts, all_labels)
-    return all_texts, all_labels
+        raw_files.append(((one_path_text, one_path_target),
+                          (one_path_text_after, one_path_target_after), mode,
+                          infer_without_label))
+    self.prepare_raw_files(raw_files, pre_process_pipeline, text_counter,
+                           all_labels)
+    return text_counter, all_labels
 
   def load_a_raw_file(self, one_path, mode, infer_without_label):
     """
@@ -78,9 +78,14 @@ class TextS2SPreparer(TextPreparer):
     texts = data_utils.load_seq2seq_raw_data([text_path])
     if not infer_without_label:
       target = data_utils.load_seq2seq_raw_data([target_path])
-      return (texts, target), [target]
+      return (texts, target), target
     return (texts, []), []
 
+  def get_tmp_dir(self, one_path_after):
+    """Stage temporary files next to the source output file."""
+    text_path, _ = one_path_after
+    return super().get_tmp_dir(text_path)
+
   def save_a_raw_file(self, label, text_after, one_path_after,
                       infer_without_label):
     text_path, target_path = one_path_after
@@ -0,0 +1,96 @@
+# Copyright (C) 2017 Beijing Didi Infinity Technology and Development Co.,Ltd.
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+''' text sequence to sequence preparer unittest'''
+
+# pylint: disable=missing-docstring
+
+import os
+import tempfile
+from pathlib import Path
+import tensorflow as tf
+from absl import logging
+
+from delta import utils
+from delta.data.preprocess.text_seq2seq_preparer import TextS2SPreparer
+from delta.data.preprocess.utils import load_vocab_dict
+
+
+class TextS2SPreparerTest(tf.test.TestCase):
+
+  def setUp(self):
+    ''' set up '''
+    main_root = Path(os.environ['MAIN_ROOT'])
+    config_file = main_root.joinpath(
+        'egs/mock_text_seq2seq_data/seq2seq/v1/config/transformer-s2s.yml')
+    self.config = utils.load_config(config_file)
+    tmp_dir = tempfile.mkdtemp()
+    self.targets = {
+        utils.INFER: ["infer target"],
+        utils.EVAL: ["eval target"],
+        utils.TRAIN: ["train target", "train more"],
+    }
+    for mode, targets in self.targets.items():
+      src_path = os.path.join(tmp_dir, "{}.src".format(mode))
+      tgt_path = os.path.join(tmp_dir, "{}.tgt".format(mode))
+      with open(src_path, "w", encoding="utf-8") as out_f:
+        out_f.write("".join("source\n" for _ in targets))
+      with open(tgt_path, "w", encoding="utf-8") as out_f:
+        out_f.write("".join(one_line + "\n" for one_line in targets))
+      self.config["data"][mode]["paths"] = {
+          "source": [src_path],
+          "target": [tgt_path]
+      }
+    self.config["data"][utils.INFER]["infer_no_label"] = False
+    task_config = self.config["data"]["task"]
+    task_config["vocab_min_frequency"] = 1
+    task_config["text_vocab"] = os.path.join(tmp_dir, "text_vocab.txt")
+    task_config["label_vocab"] = os.path.join(tmp_dir, "label_vocab.txt")
+    self.label_vocab_path = task_config["label_vocab"]
+
+  def tearDown(self):
+    ''' tear down '''
+
+  def test_label_vocab_from_all_files(self):
+    preparer = TextS2SPreparer(self.config)
+    _, all_labels = preparer.prepare_raw_data(lambda text: text)
+    all_targets = [
+        one_line for mode in preparer.all_modes
+        for one_line in self.targets[mode]
+    ]
+    self.assertEqual(all_labels, [all_targets])
+
+    preparer.prepare_label_vocab(all_labels)
+    label_vocab = load_vocab_dict(self.label_vocab_path)
+    logging.info(label_vocab)
+    for word in ["infer", "eval", "train", "more", "target"]:
+      self.assertIn(word, label_vocab)
+
+  def test_infer_no_label(self):
+    self.config["data"][utils.INFER]["infer_no_label"] = True
+    preparer = TextS2SPreparer(self.config)
+    _, all_labels = preparer.prepare_raw_data(lambda text: text)
+    self.assertEqual(all_labels,
+                     [self.targets[utils.EVAL] + self.targets[utils.TRAIN]])
+
+    infer_paths = self.config["data"][utils.INFER]["paths"]
+    with open(infer_paths["source"][0] + ".after", encoding="utf-8") as in_f:
+      self.assertEqual(in_f.read(), "source\n")
+    self.assertFalse(os.path.exists(infer_paths["target"][0] + ".after"))
+
+
+if __name__ == '__main__':
+  logging.set_verbosity(logging.DEBUG)
+  tf.test.main()
@@ -25,28 +25,47 @@ import tensorflow as tf
 from delta.data.utils.vocabulary import Vocabulary
 
 
-def get_pre_process_text_ds_iter(
-    text_placeholder,
+def get_pre_process_text_tensor(
+    text_ds,
+    text_num,
     pipeline_func,
     num_parallel_calls,
-    batch_size,
 ):
-  """Get pre-process oprators."""
-  text_ds = tf.data.Dataset.from_tensor_slices(text_placeholder)
+  """
+  Get pre-process oprators.
+  All text_num sentences of text_ds are processed in one batch,
+  which is fetched by a single run, so a whole file is materialized
+  as a single tensor.
+  """
   text_ds = text_ds.map(pipeline_func, num_parallel_calls=num_parallel_calls)
+  text_ds = text_ds.batch(text_num)
 
-  text_ds = text_ds.batch(batch_size)
+  text_t = tf.data.experimental.get_single_element(text_ds)
 
-  iterator = text_ds.make_initializable_iterator()
+  return text_t
 
-  return iterator
+
+def count_tokens(texts):
+  """
+  Count space separated tokens of texts: [sentence1, ...].
+  Return Counter({token1: count1, ...}) in the order tokens first appear.
+  """
+  return collections.Counter(
+      word for line in texts for word in line.split())
 
 
 def process_vocab(vocab_file_path, data, vocab, min_frequency=0):
-  """Process vocab"""
-  for line in data:
-    for word in line.split():
-      vocab.add(word)
+  """
+  Process vocab.
+  data: [sentence1, ...] or a Counter of tokens, Counter({token1: count1, ...})
+  """
+  if isinstance(data, collections.Counter):
+    for word, count in data.items():
+      vocab.add(word, count)
+  else:
+    for line in data:
+      for word in line.split():
+        vocab.add(word)
   if min_frequency > 0:
     vocab.trim(min_frequency)
   save_vocabs(vocab.mapping, vocab_file_path)
@@ -60,14 +79,22 @@ def save_vocabs(vocabs, vocab_file_path):
   for _id in sorted(vocabs.values()):
     ordered_vocabs[id_to_vocab[_id]] = _id
 
+  vocab_content = "".join(
+      "{}\t{}\n".format(word, _id) for word, _id in ordered_vocabs.items())
+
   if os.path.isfile(vocab_file_path):
+    # Keep an unchanged vocab file untouched, so that files derived from it
+    # (e.g. the embedding) can tell they are still up to date by mtime.
+    with open(vocab_file_path, encoding='utf-8') as in_f:
+      if in_f.read() == vocab_content:
+        logging.info("Vocab unchanged: {}".format(vocab_file_path))
+        return
     os.remove(vocab_file_path)
   if not os.path.exists(os.path.dirname(vocab_file_path)):
     os.makedirs(os.path.dirname(vocab_file_path))
 
   with open(vocab_file_path, "w", encoding='utf-8') as out_f:
-    for word, _id in ordered_vocabs.items():
-      out_f.write("{}\t{}\n".format(word, _id))
+    out_f.write(vocab_content)
 
 
 def load_vocab_dict(vocab_file_path):
@@ -136,7 +163,7 @@ def prepare_embedding(pre_train_emb_path, text_vocab_path, embedding_path):
 
   # get embedding vector for words in vocab
   vocab_size = len(vocabs)
-  emb_list = [[]] * vocab_size
+  emb_list = np.empty((vocab_size, emb_size))
   bound = np.sqrt(1.0) / np.sqrt(vocab_size)
   count_exist = 0
   count_not_exist = 0
@@ -156,7 +183,6 @@ def prepare_embedding(pre_train_emb_path, text_vocab_path, embedding_path):
       emb_list[word_id] = np.random.uniform(-bound, bound, emb_size)
     word_id += 1
 
-  emb_list = np.array(emb_list)
   logging.info("embedding exist : {}, embedding not exist : {}".format(
       count_exist, count_not_exist))
   logging.info("embedding exist dump to: {}".format(embedding_path))
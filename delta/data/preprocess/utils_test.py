@@ -0,0 +1,68 @@
+# Copyright (C) 2017 Beijing Didi Infinity Technology and Development Co.,Ltd.
+# All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+''' preprocess utils unittest'''
+
+# pylint: disable=missing-docstring
+
+import os
+import tempfile
+import collections
+import tensorflow as tf
+from absl import logging
+
+from delta.data.preprocess.utils import count_tokens
+from delta.data.preprocess.utils import prepare_vocab
+
+
+class PreprocessUtilsTest(tf.test.TestCase):
+
+  def setUp(self):
+    ''' set up '''
+    self.sentences = ["b a c", "a d b", "e a", "d c a"]
+    self.tmp_dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    ''' tear down '''
+
+  def read_vocab(self, vocab_file_path):
+    with open(vocab_file_path, encoding='utf-8') as in_f:
+      return in_f.read()
+
+  def test_count_tokens(self):
+    counter = count_tokens(self.sentences)
+    self.assertEqual(list(counter.items()), [("b", 2), ("a", 4), ("c", 2),
+                                             ("d", 2), ("e", 1)])
+    self.assertEqual(count_tokens([]), collections.Counter())
+
+  def test_prepare_vocab_from_counter(self):
+    counter = collections.Counter(
+        word for line in self.sentences for word in line.split())
+    for min_frequency in (0, 1, 2):
+      list_vocab_path = os.path.join(self.tmp_dir,
+                                     "list_vocab_{}.txt".format(min_frequency))
+      counter_vocab_path = os.path.join(
+          self.tmp_dir, "counter_vocab_{}.txt".format(min_frequency))
+      prepare_vocab(
+          list_vocab_path, self.sentences, min_frequency=min_frequency)
+      prepare_vocab(counter_vocab_path, counter, min_frequency=min_frequency)
+      list_vocab = self.read_vocab(list_vocab_path)
+      logging.info(list_vocab)
+      self.assertEqual(list_vocab, self.read_vocab(counter_vocab_path))
+
+
+if __name__ == '__main__':
+  logging.set_verbosity(logging.DEBUG)
+  tf.test.main()
@@ -269,54 +269,68 @@ def save_a_text_cls_file(label, texts_after, new_path, no_label):
   """Save a text classification data to a file."""
   logging.info("Saving processed file to: {}".format(new_path))
   with open(new_path, "w", encoding="utf-8") as out_f:
-    for i, one_line in enumerate(texts_after):
-      if no_label:
-        out_f.write(one_line + "\n")
-      else:
-        out_f.write(label[i] + "\t" + one_line + "\n")
+    if no_label:
+      out_f.writelines(one_line + "\n" for one_line in texts_after)
+    else:
+      assert len(label) == len(texts_after), \
+        "{} labels for {} texts".format(len(label), len(texts_after))
+      out_f.writelines(one_label + "\t" + one_line + "\n"
+                       for one_label, one_line in zip(label, texts_after))
 
 
 def save_a_text_match_file(label, texts_after, new_path, no_label):
   """Save a text match data to a file."""
   logging.info("Saving processed file to: {}".format(new_path))
   with open(new_path, "w", encoding="utf-8") as out_f:
-    for i, (one_line_l, one_line_r) in enumerate(zip(*texts_after)):
-      if no_label:
-        out_f.write(one_line_l + '\t' + one_line_r + "\n")
-      else:
-        out_f.write(label[i] + "\t" + one_line_l + '\t' + one_line_r + "\n")
+    texts_l, texts_r = texts_after
+    assert len(texts_l) == len(texts_r), \
+      "{} left texts for {} right texts".format(len(texts_l), len(texts_r))
+    if no_label:
+      out_f.writelines(one_line_l + '\t' + one_line_r + "\n"
+                       for one_line_l, one_line_r in zip(*texts_after))
+    else:
+      assert len(label) == len(texts_l), \
+        "{} labels for {} texts".format(len(label), len(texts_l))
+      out_f.writelines(
+          one_label + "\t" + one_line_l + '\t' + one_line_r + "\n"
+          for one_label, one_line_l, one_line_r in zip(label, *texts_after))
 
 
 def save_a_text_seq_label_file(label, texts_after, new_path, no_label):
   """Save a text seqlabel data to a file."""
   logging.info("Saving processed file to: {}".format(new_path))
   with open(new_path, "w", encoding="utf-8") as out_f:
-    for i, one_line in enumerate(texts_after):
-      if no_label:
-        out_f.write(one_line + "\n")
-      else:
-        out_f.write(label[i] + "\t" + one_line + "\n")
+    if no_label:
+      out_f.writelines(one_line + "\n" for one_line in texts_after)
+    else:
+      assert len(label) == len(texts_after), \
+        "{} labels for {} texts".format(len(label), len(texts_after))
+      out_f.writelines(one_label + "\t" + one_line + "\n"
+                       for one_label, one_line in zip(label, texts_after))
 
 
 def save_a_text_seq2seq_file(texts_after, new_path):
   """Save a text sequence data to a file"""
   logging.info("Saving processed file to: {}".format(new_path))
   with open(new_path, "w", encoding="utf-8") as out_f:
-    for i, one_line in enumerate(texts_after):
-      out_f.write(one_line + "\n")
+    out_f.writelines(one_line + "\n" for one_line in texts_after)
 
 
 def save_a_text_nlu_joint_file(label, texts_after, new_path, no_label):
   """Save a text nlu joint data to a file."""
-  intent_label, slots_label = label
   logging.info("Saving processed file to: {}".format(new_path))
   with open(new_path, "w", encoding="utf-8") as out_f:
-    for i, one_line in enumerate(texts_after):
-      if no_label:
-        out_f.write(one_line + "\n")
-      else:
-        out_f.write(intent_label[i] + "\t" + slots_label[i] + "\t" + one_line +
-                    "\n")
+    if no_label:
+      out_f.writelines(one_line + "\n" for one_line in texts_after)
+    else:
+      intent_label, slots_label = label
+      assert len(intent_label) == len(slots_label) == len(texts_after), \
+        "{} intent labels and {} slots labels for {} texts".format(
+            len(intent_label), len(slots_label), len(texts_after))
+      out_f.writelines(
+          one_intent + "\t" + one_slots + "\t" + one_line + "\n"
+          for one_intent, one_slots, one_line in zip(intent_label, slots_label,
+                                                     texts_after))
 
 
 def load_npy(npy_path, dtype=np.float32):
@@ -24,6 +24,11 @@ from delta import utils
 from delta.data.utils.common_utils import load_seq_label_raw_data
 from delta.data.utils.common_utils import load_one_label_dataset
 from delta.data.utils.common_utils import load_multi_label_dataset
+from delta.data.utils.common_utils import save_a_text_cls_file
+from delta.data.utils.common_utils import save_a_text_match_file
+from delta.data.utils.common_utils import save_a_text_seq_label_file
+from delta.data.utils.common_utils import save_a_text_seq2seq_file
+from delta.data.utils.common_utils import save_a_text_nlu_joint_file
 
 # pylint: disable=invalid-name,too-many-locals,missing-docstring
 
@@ -85,5 +90,58 @@ class CommonUtilsTest(tf.test.TestCase):
         self.assertEqual(list(sess.run(label_res)[:3]), true_res)
 
 
+  def read_saved_file(self, save_func, *args):
+    new_path = tempfile.mktemp(suffix='.after')
+    save_func(*args[:-1], new_path, args[-1])
+    with open(new_path, encoding='utf-8') as in_f:
+      return in_f.read()
+
+  def test_save_a_text_cls_file(self):
+    self.assertEqual(
+        self.read_saved_file(save_a_text_cls_file, ["0", "1"], ["a b", "c"],
+                             False), "0\ta b\n1\tc\n")
+    self.assertEqual(
+        self.read_saved_file(save_a_text_cls_file, [], ["a b", "c"], True),
+        "a b\nc\n")
+    with self.assertRaises(AssertionError):
+      self.read_saved_file(save_a_text_cls_file, ["0"], ["a b", "c"], False)
+
+  def test_save_a_text_match_file(self):
+    texts_after = [["a", "b"], ["c", "d"]]
+    self.assertEqual(
+        self.read_saved_file(save_a_text_match_file, ["0", "1"], texts_after,
+                             False), "0\ta\tc\n1\tb\td\n")
+    self.assertEqual(
+        self.read_saved_file(save_a_text_match_file, [], texts_after, True),
+        "a\tc\nb\td\n")
+    with self.assertRaises(AssertionError):
+      self.read_saved_file(save_a_text_match_file, ["0"], texts_after, False)
+    with self.assertRaises(AssertionError):
+      self.read_saved_file(save_a_text_match_file, [], [["a", "b"], ["c"]],
+                           True)
+
+  def test_save_a_text_seq_label_file(self):
+    self.assertEqual(
+        self.read_saved_file(save_a_text_seq_label_file, ["O B-PER"],
+                             ["i john"], False), "O B-PER\ti john\n")
+    with self.assertRaises(AssertionError):
+      self.read_saved_file(save_a_text_seq_label_file, [], ["i john"], False)
+
+  def test_save_a_text_seq2seq_file(self):
+    new_path = tempfile.mktemp(suffix='.after')
+    save_a_text_seq2seq_file(["a b", "c"], new_path)
+    with open(new_path, encoding='utf-8') as in_f:
+      self.assertEqual(in_f.read(), "a b\nc\n")
+
+  def test_save_a_text_nlu_joint_file(self):
+    label = [["greet"], ["O B-PER"]]
+    self.assertEqual(
+        self.read_saved_file(save_a_text_nlu_joint_file, label, ["hi john"],
+                             False), "greet\tO B-PER\thi john\n")
+    with self.assertRaises(AssertionError):
+      self.read_saved_file(save_a_text_nlu_joint_file, [["greet"], []],
+                           ["hi john"], False)
+
+
 if __name__ == '__main__':
   tf.test.main()
@@ -48,11 +48,11 @@ class Vocabulary:
   def __getitem__(self, key):
     return self._mapping[key]
 
-  def add(self, word):
+  def add(self, word, count=1):
     ''' update vocab statis'''
     if word not in self._mapping:
       self._mapping[word] = len(self._mapping)
-    self._freq[word] += 1
+    self._freq[word] += count
 
   def trim(self, min_frequency):
     ''' trim word freq less than min_frequency'''